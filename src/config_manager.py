@@ -1,6 +1,6 @@
 import asyncio
 import logging
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 from pathlib import Path
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
@@ -16,6 +16,8 @@ class ConfigManager:
         self.session_factory = session_factory
         self._cache: Dict[str, Any] = {}
         self._lock = asyncio.Lock()
+        # 按配置键注册的变更回调，在对应缓存失效时触发
+        self._listeners: Dict[str, List[Callable[[], None]]] = {}
         self.logger = logging.getLogger(self.__class__.__name__)
 
     async def get(self, key: str, default: Optional[Any] = None) -> Any:
@@ -37,6 +39,26 @@ class ConfigManager:
             self._cache[key] = value
             return value
 
+    async def get_many(self, keys: Sequence[str], default: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        批量获取多个配置项。
+        缓存中缺失的键会通过一次数据库查询一并加载并存入缓存。
+        """
+        values = {key: self._cache[key] for key in keys if key in self._cache}
+        if len(values) == len(keys):
+            return values
+
+        async with self._lock:
+            # 再次检查，防止在等待锁的过程中其他协程已经加载了配置
+            values.update({key: self._cache[key] for key in keys if key in self._cache})
+            missing = [key for key in keys if key not in values]
+            if missing:
+                async with self.session_factory() as session:
+                    fetched = await crud.get_config_values(session, missing, default)
+                self._cache.update(fetched)
+                values.update(fetched)
+        return {key: values[key] for key in keys}
+
     async def setValue(self, configKey: str, configValue: str):
         """
         更新一个配置项的值，并使缓存失效。
@@ -54,13 +76,36 @@ class ConfigManager:
         async with self.session_factory() as session:
             await crud.initialize_configs(session, defaults)
 
+    def subscribe(self, key: str, callback: Callable[[], None]):
+        """
+        注册一个回调，当指定配置项的缓存失效（即配置被修改）时调用。
+        回调是同步的，应只做轻量的标记工作。
+        """
+        self._listeners.setdefault(key, []).append(callback)
+
+    def unsubscribe(self, key: str, callback: Callable[[], None]):
+        """移除之前通过 `subscribe` 注册的回调。"""
+        callbacks = self._listeners.get(key)
+        if callbacks and callback in callbacks:
+            callbacks.remove(callback)
+
+    def _notify(self, key: str):
+        for callback in list(self._listeners.get(key, ())):
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"执行配置 '{key}' 的变更回调时出错: {e}", exc_info=True)
+
     def invalidate(self, key: str):
         """从缓存中移除一个特定的键，以便下次获取时能从数据库重新加载。"""
         if key in self._cache:
             del self._cache[key]
             self.logger.info(f"配置缓存已失效: '{key}'")
+        self._notify(key)
 
     def clear_cache(self):
         """清空内存中的配置缓存，以便下次获取时能从数据库重新加载。"""
         self._cache.clear()
         self.logger.info("所有配置缓存已清空。")
+        for key in list(self._listeners):
+            self._notify(key)
@@ -1405,6 +1405,13 @@ async def get_config_value(session: AsyncSession, key: str, default: str) -> str
     value = result.scalar_one_or_none()
     return value if value is not None else default
 
+async def get_config_values(session: AsyncSession, keys: List[str], default: str) -> Dict[str, str]:
+    """通过一次查询获取多个配置项，不存在的键返回默认值。"""
+    stmt = select(Config.configKey, Config.configValue).where(Config.configKey.in_(keys))
+    result = await session.execute(stmt)
+    found = {key: value for key, value in result.all() if value is not None}
+    return {key: found.get(key, default) for key in keys}
+
 async def get_cache(session: AsyncSession, key: str) -> Optional[Any]:
     stmt = select(CacheData.cacheValue).where(CacheData.cacheKey == key, CacheData.expiresAt > func.now())
     result = await session.execute(stmt)
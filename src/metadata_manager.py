@@ -1,21 +1,46 @@
 import asyncio
 import importlib
-import traceback
-import inspect
+import os
 import logging
 import pkgutil
+import sys
+from importlib.metadata import entry_points
 from pathlib import Path
-from typing import Any, Dict, List, Set, Optional, Type
+from types import ModuleType
+from typing import Any, Dict, List, Set, Optional, Tuple, Type
 
+import httpx
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
-from fastapi import HTTPException, status, Request, APIRouter
+from fastapi import HTTPException, Request, APIRouter
 
-from . import crud, models, orm_models
+from . import crud, models
 from .config_manager import ConfigManager
 from .scraper_manager import ScraperManager
 
 logger = logging.getLogger(__name__)
-import httpx
+
+# 外部元数据源插件用于注册自身的入口点组
+METADATA_SOURCE_ENTRY_POINT_GROUP = "danmu.metadata_sources"
+
+# 同时进行连接性检查的最大源数量
+_CONNECTIVITY_CHECK_CONCURRENCY = 4
+
+# 重新加载后旧源实例延迟关闭的时间（秒），需长于请求超时，让仍在使用它们的请求正常完成
+_RETIRED_SOURCE_CLOSE_DELAY = 60
+
+# 将提供商名称映射到其在数据库中的配置键，以及返回给前端的格式：
+# "single" 为单值配置，以 {"value": ...} 的形式返回；"dict" 则按配置键返回所有值。
+_PROVIDER_CONFIG_KEYS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    # Metadata Sources
+    "tmdb": (("tmdbApiKey", "tmdbApiBaseUrl", "tmdbImageBaseUrl"), "dict"),
+    "bangumi": (("bangumiClientId", "bangumiClientSecret", "bangumiToken"), "dict"),
+    "douban": (("doubanCookie",), "single"),
+    "tvdb": (("tvdbApiKey",), "single"),
+    "imdb": ((), "dict"),  # IMDb 目前没有特定配置
+    # Scrapers
+    "gamer": (("gamerCookie", "gamerUserAgent", "gamerEpisodeBlacklistRegex", "scraperGamerLogResponses"), "dict"),
+}
+
 class MetadataSourceManager:
     """
     通过动态加载来管理元数据源的状态和状态。
@@ -39,8 +64,14 @@ class MetadataSourceManager:
         self.sources: Dict[str, Any] = {}
         # 在实例化之前存储发现的源类。
         self._source_classes: Dict[str, Type[Any]] = {}
+        # 按模块名缓存已发现的插件类及其源文件修改时间，文件未变更时重新加载可跳过导入。
+        self._plugin_cache: Dict[str, Tuple[int, List[Type[Any]]]] = {}
         # 从数据库缓存所有源的持久设置。
         self.source_settings: Dict[str, Dict[str, Any]] = {}
+        # 已启用辅助搜索且加载成功的源 (provider_name, 实例)，按显示顺序排列，随源一起重新加载。
+        self._enabled_aux_sources: List[Tuple[str, Any]] = []
+        # 等待关闭被重新加载替换的旧源实例的后台任务
+        self._retired_source_tasks: Set[asyncio.Task] = set()
         self.scraper_manager = scraper_manager
         # 新增：为所有元数据源创建一个父级路由器
         self.router = APIRouter()
@@ -57,49 +88,146 @@ class MetadataSourceManager:
         """
         self.logger.info("正在注册元数据源提供的API路由...")
         for provider_name, source_instance in self.sources.items():
-            # 检查源实例是否有 'api_router' 属性，并且它是一个 APIRouter
-            if hasattr(source_instance, 'api_router') and isinstance(getattr(source_instance, 'api_router', None), APIRouter):
+            # 检查源实例的 'api_router' 属性是否是一个 APIRouter
+            api_router = getattr(source_instance, 'api_router', None)
+            if isinstance(api_router, APIRouter):
                 # 将每个源的路由包含到管理器的父级路由中，使用提供商名称作为前缀
                 self.router.include_router(
-                    source_instance.api_router,
+                    api_router,
                     prefix=f"/{provider_name}",
                     tags=[f"Metadata - {provider_name.capitalize()}"]
                 )
                 self.logger.info(f"已为源 '{provider_name}' 添加API路由，子前缀: /{provider_name}")
 
+    @staticmethod
+    def _get_module_mtime_ns(finder: Any, name: str) -> Optional[int]:
+        """获取插件模块源文件的修改时间，用于判断缓存的插件类是否仍然有效。"""
+        try:
+            spec = finder.find_spec(name)
+            return os.stat(spec.origin).st_mtime_ns
+        except (AttributeError, TypeError, OSError):
+            return None
+
+    @staticmethod
+    def _import_plugin_module(module_name: str, reload: bool) -> ModuleType:
+        """导入插件模块。如果模块文件在上次导入后发生了变更，则重新加载它。"""
+        module = importlib.import_module(module_name)
+        if not reload:
+            return module
+        try:
+            return importlib.reload(module)
+        except Exception:
+            # 重新加载失败时旧模块仍留在 sys.modules 中，下次 import_module 会直接返回它而掩盖错误，
+            # 因此将其移除，让下次重新加载时再次导入并暴露错误
+            sys.modules.pop(module_name, None)
+            raise
+
+    @staticmethod
+    def _find_source_classes(module: ModuleType, module_name: str) -> List[Type[Any]]:
+        """返回在指定模块中定义的所有元数据源插件类。"""
+        source_classes = []
+        # 直接遍历模块命名空间，只检查在该模块中定义的类
+        for obj in list(vars(module).values()):
+            if not isinstance(obj, type) or obj.__module__ != module_name:
+                continue
+            if MetadataSourceManager._is_source_class(obj):
+                source_classes.append(obj)
+        return source_classes
+
+    @staticmethod
+    def _is_source_class(obj: Any) -> bool:
+        # 使用鸭子类型（duck typing）来识别插件，而不是依赖于一个共享的基类。
+        # 如果一个类有 'provider_name' 属性和 'search_aliases' 方法，我们就认为它是一个元数据源插件。
+        return (isinstance(obj, type) and
+                hasattr(obj, 'provider_name') and
+                hasattr(obj, 'search_aliases') and
+                hasattr(obj, 'get_details'))
+
+    @staticmethod
+    def _load_entry_point_sources() -> List[Tuple[str, Any]]:
+        """
+        加载通过 `danmu.metadata_sources` 入口点注册的插件类。
+        返回 (入口点名称, 插件类或加载时抛出的异常) 列表。
+        """
+        loaded = []
+        for ep in entry_points(group=METADATA_SOURCE_ENTRY_POINT_GROUP):
+            try:
+                loaded.append((ep.name, ep.load()))
+            except Exception as e:
+                loaded.append((ep.name, e))
+        return loaded
+
     async def load_and_sync_sources(self):
         """动态发现、同步到数据库并加载元数据源插件。"""
-        await self.close_all()  # 在重新加载前确保旧连接已关闭
+        # 旧的源实例可能仍在处理请求，延迟关闭它们以免中断这些请求
+        self._retire_sources(list(self.sources.items()))
         self.sources.clear()
         self._source_classes.clear()
         self.source_settings.clear()
+        self._enabled_aux_sources = []
 
         discovered_providers = []
         
         sources_package_path = [str(Path(__file__).parent / "metadata_sources")]
+        # (模块名, 完整模块名, 源文件修改时间, 缓存中仍然有效的插件类)
+        candidates: List[Tuple[str, str, Optional[int], Optional[List[Type[Any]]]]] = []
         for finder, name, ispkg in pkgutil.iter_modules(sources_package_path):
             if name.startswith("_") or name == "base":
                 continue
+            module_name = f"src.metadata_sources.{name}"
+            mtime_ns = self._get_module_mtime_ns(finder, name)
+            cached = self._plugin_cache.get(module_name)
+            cached_classes = cached[1] if cached and mtime_ns is not None and cached[0] == mtime_ns else None
+            candidates.append((name, module_name, mtime_ns, cached_classes))
+
+        # 仅导入新增或文件已变更的模块，并在线程池中并发执行，避免串行导入阻塞事件循环
+        to_import = [module_name for _, module_name, _, cached_classes in candidates if cached_classes is None]
+        modules = await asyncio.gather(
+            *(asyncio.to_thread(self._import_plugin_module, module_name, module_name in self._plugin_cache) for module_name in to_import),
+            return_exceptions=True
+        )
+        imported_modules = dict(zip(to_import, modules))
+
+        for name, module_name, mtime_ns, source_classes in candidates:
+            if source_classes is None:
+                module = imported_modules[module_name]
+                if isinstance(module, BaseException):
+                    self._plugin_cache.pop(module_name, None)
+                    self.logger.error(f"从模块 {name} 加载元数据源失败: {module}", exc_info=module)
+                    continue
+                try:
+                    source_classes = self._find_source_classes(module, module_name)
+                except Exception as e:
+                    self._plugin_cache.pop(module_name, None)
+                    self.logger.error(f"从模块 {name} 加载元数据源失败: {e}", exc_info=True)
+                    continue
+                if mtime_ns is not None:
+                    self._plugin_cache[module_name] = (mtime_ns, source_classes)
+
+            for obj in source_classes:
+                provider_name = obj.provider_name
+                if provider_name in self._source_classes:
+                    self.logger.warning(f"发现重复的元数据源 '{provider_name}'。将被覆盖。")
+                
+                self._source_classes[provider_name] = obj
+                discovered_providers.append(provider_name)
+                self.logger.info(f"元数据源 '{provider_name}' (来自模块 {name}) 已发现。")
+
+        # 以包形式安装的外部插件通过入口点直接注册插件类，无需导入并扫描整个模块
+        for ep_name, obj in await asyncio.to_thread(self._load_entry_point_sources):
+            if isinstance(obj, Exception):
+                self.logger.error(f"从入口点 {ep_name} 加载元数据源失败: {obj}", exc_info=obj)
+                continue
+            if not self._is_source_class(obj):
+                self.logger.warning(f"入口点 {ep_name} 指向的对象不是有效的元数据源插件，已忽略。")
+                continue
+            provider_name = obj.provider_name
+            if provider_name in self._source_classes:
+                self.logger.warning(f"发现重复的元数据源 '{provider_name}'。将被覆盖。")
 
-            try:
-                module_name = f"src.metadata_sources.{name}"
-                module = importlib.import_module(module_name)
-                for class_name, obj in inspect.getmembers(module, inspect.isclass):
-                    # 使用鸭子类型（duck typing）来识别插件，而不是依赖于一个共享的基类。
-                    # 如果一个类有 'provider_name' 属性和 'search_aliases' 方法，我们就认为它是一个元数据源插件。
-                    if (hasattr(obj, 'provider_name') and
-                        hasattr(obj, 'search_aliases') and
-                        hasattr(obj, 'get_details') and
-                        obj.__module__ == module_name):
-                        provider_name = obj.provider_name
-                        if provider_name in self._source_classes:
-                            self.logger.warning(f"发现重复的元数据源 '{provider_name}'。将被覆盖。")
-                        
-                        self._source_classes[provider_name] = obj
-                        discovered_providers.append(provider_name)
-                        self.logger.info(f"元数据源 '{provider_name}' (来自模块 {name}) 已发现。")
-            except Exception as e:
-                self.logger.error(f"从模块 {name} 加载元数据源失败: {e}", exc_info=True)
+            self._source_classes[provider_name] = obj
+            discovered_providers.append(provider_name)
+            self.logger.info(f"元数据源 '{provider_name}' (来自入口点 {ep_name}) 已发现。")
 
         async with self._session_factory() as session:
             await crud.sync_metadata_sources_to_db(session, discovered_providers)
@@ -108,34 +236,50 @@ class MetadataSourceManager:
         self.source_settings = {s['providerName']: s for s in settings_list}
 
         for provider_name, source_class in self._source_classes.items():
-            self.sources[provider_name] = source_class(self._session_factory, self._config_manager, self.scraper_manager)
+            try:
+                source_instance = source_class(self._session_factory, self._config_manager, self.scraper_manager)
+            except Exception as e:
+                # 单个插件初始化失败不应影响其他源的加载
+                self.logger.error(f"初始化元数据源 '{provider_name}' 失败: {e}", exc_info=True)
+                continue
+            # 在构造之后注入该源的持久设置，以兼容构造函数只接受三个参数的插件
+            source_instance._settings = self.source_settings.get(provider_name, {})
+            self.sources[provider_name] = source_instance
             self.logger.info(f"已加载元数据源 '{provider_name}'。")
 
-    async def search_aliases_from_enabled_sources(self, keyword: str, user: models.User) -> Set[str]:
-        """从所有已启用的辅助元数据源并发获取别名。"""
-        async with self._session_factory() as session:
-            enabled_sources_settings = await crud.get_enabled_aux_metadata_sources(session)
-        
-        tasks = []
-        for source_setting in enabled_sources_settings:
-            provider = source_setting['providerName']
-            if source_instance := self.sources.get(provider):
-                tasks.append(source_instance.search_aliases(keyword, user))
+        self._refresh_enabled_aux_sources()
+
+    def _refresh_enabled_aux_sources(self):
+        """根据当前的源设置，重新绑定已启用辅助搜索的源实例。"""
+        enabled_aux_sources = []
+        for provider_name, setting in self.source_settings.items():
+            if not setting.get('isAuxSearchEnabled'):
+                continue
+            if source_instance := self.sources.get(provider_name):
+                enabled_aux_sources.append((provider_name, source_instance))
             else:
-                self.logger.warning(f"已启用的元数据源 '{provider}' 未被成功加载，跳过别名搜索。")
+                self.logger.warning(f"已启用的元数据源 '{provider_name}' 未被成功加载，将跳过其别名搜索。")
+        self._enabled_aux_sources = enabled_aux_sources
 
-        if not tasks:
+    @property
+    def enabled_aux_provider_names(self) -> List[str]:
+        """已启用辅助搜索且加载成功的源名称，按显示顺序排列。"""
+        return [provider_name for provider_name, _ in self._enabled_aux_sources]
+
+    async def search_aliases_from_enabled_sources(self, keyword: str, user: models.User) -> Set[str]:
+        """从所有已启用的辅助元数据源并发获取别名。"""
+        enabled_sources = self._enabled_aux_sources
+        if not enabled_sources:
             return set()
 
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        all_aliases: Set[str] = set()
+        results = await asyncio.gather(
+            *(source_instance.search_aliases(keyword, user) for _, source_instance in enabled_sources),
+            return_exceptions=True
+        )
         
         # 修正：改进错误日志记录
-        for i, res in enumerate(results):
-            if isinstance(res, set):
-                all_aliases.update(res)
-            elif isinstance(res, Exception):
-                provider_name = enabled_sources_settings[i]['providerName']
+        for (provider_name, _), res in zip(enabled_sources, results):
+            if isinstance(res, Exception):
                 # 针对常见的网络错误提供更友好的提示
                 if isinstance(res, httpx.ConnectError):
                     self.logger.warning(f"无法连接到元数据源 '{provider_name}'。请检查网络连接或代理设置。")
@@ -144,20 +288,31 @@ class MetadataSourceManager:
                 else:
                     # 对于其他异常，记录更详细的信息，但避免完整的堆栈跟踪，除非在调试模式下
                     self.logger.error(f"元数据源 '{provider_name}' 的辅助搜索子任务失败: {res}", exc_info=False)
-        
+
+        all_aliases: Set[str] = set().union(*(res for res in results if isinstance(res, set)))
         # 过滤掉潜在的 None 或空字符串
-        return {alias for alias in all_aliases if alias}
+        all_aliases.discard("")
+        all_aliases.discard(None)
+        return all_aliases
 
     async def get_sources_with_status(self) -> List[Dict[str, Any]]:
         """获取所有元数据源及其持久化和临时状态。"""
-        tasks = []
-        # 确保我们只检查已加载的源
-        loaded_providers = list(self.sources.keys())
-        for provider_name in loaded_providers:
-            tasks.append(self.sources[provider_name].check_connectivity())
-        
-        connectivity_statuses = await asyncio.gather(*tasks, return_exceptions=True)
-        status_map = dict(zip(loaded_providers, connectivity_statuses))
+        semaphore = asyncio.Semaphore(_CONNECTIVITY_CHECK_CONCURRENCY)
+
+        async def _check(source_instance: Any) -> Any:
+            async with semaphore:
+                try:
+                    return await source_instance.check_connectivity()
+                except Exception as e:
+                    return e
+
+        # 确保我们只检查已加载的源，并限制同时进行的外部请求数量
+        async with asyncio.TaskGroup() as tg:
+            check_tasks = {
+                provider_name: tg.create_task(_check(source_instance))
+                for provider_name, source_instance in self.sources.items()
+            }
+        status_map = {provider_name: task.result() for provider_name, task in check_tasks.items()}
 
         full_status_list = []
         for provider_name, setting in self.source_settings.items():
@@ -291,39 +446,22 @@ class MetadataSourceManager:
         """
         获取特定提供商（元数据源或搜索源）的配置。
         """
-
-        # 将提供商名称映射到其在数据库中的配置键
-        config_keys_map = {
-            # Metadata Sources
-            "tmdb": ["tmdbApiKey", "tmdbApiBaseUrl", "tmdbImageBaseUrl"],
-            "bangumi": ["bangumiClientId", "bangumiClientSecret", "bangumiToken"],
-            "douban": ["doubanCookie"],
-            "tvdb": ["tvdbApiKey"],
-            "imdb": [],  # IMDb 目前没有特定配置
-            # Scrapers
-            "gamer": ["gamerCookie", "gamerUserAgent", "gamerEpisodeBlacklistRegex", "scraperGamerLogResponses"],
-        }
-
-        keys_to_fetch = config_keys_map.get(providerName)
+        provider_config = _PROVIDER_CONFIG_KEYS.get(providerName)
 
         # 如果提供商没有特定的配置键，检查它是否是一个已知的提供商
-        if keys_to_fetch is None:
+        if provider_config is None:
             is_known_metadata_source = providerName in self.sources
             is_known_scraper = providerName in self.scraper_manager.scrapers
             if not is_known_metadata_source and not is_known_scraper:
                 raise HTTPException(status_code=404, detail=f"未找到提供商: {providerName}")
             return {}
 
-        config_values = {key: await self._config_manager.get(key, "") for key in keys_to_fetch}
+        keys_to_fetch, shape = provider_config
+        config_values = await self._config_manager.get_many(keys_to_fetch, "")
 
         # 为单值配置提供特殊处理，以匹配前端期望的格式
-        if providerName in ["douban", "tvdb"]:
-            return {"value": next(iter(config_values.values()), "")}
-        
-        # 新增：为Gamer也返回单值value，以简化前端处理
-        if providerName == "gamer":
-            # 修正：此前的实现有误，只返回了Cookie。现在返回所有为Gamer获取的配置。
-            return config_values
+        if shape == "single":
+            return {"value": config_values[keys_to_fetch[0]]}
 
         # 新增：为Bangumi添加 authMode 字段，以明确告知前端当前应显示哪种模式
         if providerName == "bangumi":
@@ -379,14 +517,33 @@ class MetadataSourceManager:
         else:
             self.logger.warning("TMDB 元数据源未加载或不支持 `update_tmdb_mappings` 方法。")
 
+    def _retire_sources(self, sources: List[Tuple[str, Any]]):
+        """在后台延迟关闭被重新加载替换的源实例。"""
+        if not sources:
+            return
+        task = asyncio.create_task(self._close_sources_later(sources))
+        self._retired_source_tasks.add(task)
+        task.add_done_callback(self._retired_source_tasks.discard)
+
+    async def _close_sources_later(self, sources: List[Tuple[str, Any]]):
+        try:
+            await asyncio.sleep(_RETIRED_SOURCE_CLOSE_DELAY)
+        finally:
+            await self._close_sources(sources)
+
+    async def _close_sources(self, sources: List[Tuple[str, Any]]):
+        results = await asyncio.gather(*(source.close() for _, source in sources), return_exceptions=True)
+        for (provider_name, _), result in zip(sources, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"关闭元数据源 '{provider_name}' 时出错: {result}", exc_info=result)
+
     async def close_all(self):
         """在应用关闭时关闭所有元数据源客户端。"""
         self.logger.info("正在关闭所有元数据源...")
-        tasks = [source.close() for source in self.sources.values()]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                self.logger.error(f"在清理的过程中发现了错误{result} 详细信息{traceback.format_exc()}")
-                provider_name = list(self.sources.keys())[i]
-                self.logger.error(f"关闭元数据源 '{provider_name}' 时出错: {result}")
+        # 取消等待中的延迟关闭任务，旧的源实例会在任务的 finally 中立即关闭
+        retired_tasks = list(self._retired_source_tasks)
+        for task in retired_tasks:
+            task.cancel()
+        await asyncio.gather(*retired_tasks, return_exceptions=True)
+        await self._close_sources(list(self.sources.items()))
         self.logger.info("所有元数据源已关闭。")
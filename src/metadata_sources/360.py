@@ -66,6 +66,8 @@ class So360MetadataSource(BaseMetadataSource):
         super().__init__(session_factory, config_manager, scraper_manager)
         self.api_base_url = "https://api.so.360kan.com"
         self.web_base_url = "https://www.360kan.com"
+
+    async def _create_client(self) -> httpx.AsyncClient:
         # 修正：硬编码一组更完整的有效Cookie，以确保API请求成功
         hardcoded_cookies = {
             '__guid': '26972607.2949894437869698600.1752640253092.913',
@@ -75,7 +77,7 @@ class So360MetadataSource(BaseMetadataSource):
             '__DC_gid': '26972607.192430250.1752640253137.1752656674152.17',
             'monitor_count': '12',
         }
-        self.client = httpx.AsyncClient(
+        return httpx.AsyncClient(
             headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"},
             cookies=hardcoded_cookies,
             timeout=20.0,
@@ -95,7 +97,8 @@ class So360MetadataSource(BaseMetadataSource):
         try:
             encoded_keyword = quote(keyword)
             headers = {'Referer': f'https://so.360kan.com/?kw={encoded_keyword}'}
-            response = await self.client.get(search_url, params=params, headers=headers)
+            client = await self._get_client()
+            response = await client.get(search_url, params=params, headers=headers)
             response.raise_for_status()
 
             json_text = response.text
@@ -180,10 +183,11 @@ class So360MetadataSource(BaseMetadataSource):
     async def get_details(self, item_id: str, user: models.User, mediaType: Optional[str] = None) -> Optional[models.MetadataDetailsResponse]:
         possible_paths = [f"/dianshiju/{item_id}.html", f"/dongman/{item_id}.html", f"/dianying/{item_id}.html"]
         try:
+            client = await self._get_client()
             for path in possible_paths:
                 detail_url = f"{self.web_base_url}{path}"
                 try:
-                    response = await self.client.get(detail_url)
+                    response = await client.get(detail_url)
                     if response.status_code == 200:
                         soup = BeautifulSoup(response.text, "lxml")
                         script_tag = soup.find("script", string=re.compile(r"window\.g_initialData\s*="))
@@ -304,13 +308,14 @@ class So360MetadataSource(BaseMetadataSource):
             if not years_to_check and year:
                 years_to_check = [year]
 
+            client = await self._get_client()
             all_episodes = []
             for y in years_to_check:
                 offset = 0
                 while True:
                     params = {'site': site, 'y': y, 'entid': ent_id, 'offset': offset, 'count': 100, 'v_ap': '1', 'cb': '__jp7'}
                     try:
-                        resp = await self.client.get(f'{self.api_base_url}/episodeszongyi', params=params)
+                        resp = await client.get(f'{self.api_base_url}/episodeszongyi', params=params)
                         json_text = resp.text.strip()
                         if json_text.startswith('__jp7('): json_text = json_text[len('__jp7('):-1]
                         parsed = json.loads(json_text)
@@ -328,7 +333,8 @@ class So360MetadataSource(BaseMetadataSource):
             s_param = json.dumps([{"cat_id": cat_id, "ent_id": ent_id, "site": site}])
             params = {'v_ap': '1', 's': s_param, 'cb': '__jp8'}
             try:
-                resp = await self.client.get(f'{self.api_base_url}/episodesv2', params=params)
+                client = await self._get_client()
+                resp = await client.get(f'{self.api_base_url}/episodesv2', params=params)
                 json_text = resp.text.strip()
                 if json_text.startswith('__jp8('):
                     json_text = json_text[len('__jp8('):-1]
@@ -350,10 +356,11 @@ class So360MetadataSource(BaseMetadataSource):
                 aliases.update(item.aliasesCn)
         return {alias for alias in aliases if alias}
 
-    async def check_connectivity(self) -> str:
+    async def _do_check_connectivity(self) -> str:
         try:
             # 修正：连接检测应模拟真实搜索流程
-            response = await self.client.get(f"{self.api_base_url}/index?kw=test&cb=__jp0", timeout=10.0)
+            client = await self._get_client()
+            response = await client.get(f"{self.api_base_url}/index?kw=test&cb=__jp0", timeout=10.0)
             response.raise_for_status()
             text = response.text
             # 使用与搜索相同的健壮解析逻辑
@@ -373,6 +380,3 @@ class So360MetadataSource(BaseMetadataSource):
             
     async def execute_action(self, action_name: str, payload: Dict[str, Any], user: models.User, request: Any) -> Any:
         raise NotImplementedError(f"操作 '{action_name}' 在 {self.provider_name} 中未实现。")
-
-    async def close(self):
-        await self.client.aclose()
@@ -210,6 +210,7 @@ async def bangumi_auth_callback(request: Request, code: str = Query(...), state:
 
 class BangumiMetadataSource(BaseMetadataSource):
     provider_name = "bangumi"
+    connectivity_config_keys = ("bangumiToken", "bangumiClientId", "proxyUrl", "proxyEnabled", "proxySslVerify")
     api_router = auth_router
     
     def __init__(self, session_factory: async_sessionmaker[AsyncSession], config_manager: ConfigManager, scraper_manager: ScraperManager):
@@ -236,6 +237,11 @@ class BangumiMetadataSource(BaseMetadataSource):
         async with self._session_factory() as session:
             await crud.set_cache(session, key, value, ttl_seconds)
 
+    def invalidate_connectivity(self):
+        # bangumiToken 可能已变更，下次使用时重新读取
+        super().invalidate_connectivity()
+        self._config_loaded = False
+
     async def _ensure_config(self):
         """从数据库配置中加载个人访问令牌。"""
         if self._config_loaded:
@@ -351,7 +357,7 @@ class BangumiMetadataSource(BaseMetadataSource):
             self.logger.warning(f"Bangumi辅助搜索失败: {e}")
         return {alias for alias in local_aliases if alias}
 
-    async def check_connectivity(self) -> str:
+    async def _do_check_connectivity(self) -> str:
         """检查与Bangumi API的连接性，并遵循代理设置。优先验证Token，再检查OAuth配置。"""
         await self._ensure_config()
 
@@ -393,18 +399,15 @@ class BangumiMetadataSource(BaseMetadataSource):
         # 3. 如果两者都没有，只检查网络连通性
         proxy_to_use = None
         try:
-            async with self._session_factory() as session:
-                proxy_url = await crud.get_config_value(session, "proxy_url", "")
-                proxy_enabled_str = await crud.get_config_value(session, "proxy_enabled", "false")
-                ssl_verify_str = await crud.get_config_value(session, "proxySslVerify", "true")
-                ssl_verify = ssl_verify_str.lower() == 'true'
-                proxy_enabled_globally = proxy_enabled_str.lower() == 'true'
-
-                if proxy_enabled_globally and proxy_url:
-                    source_setting = await crud.get_metadata_source_setting_by_name(session, self.provider_name)
-                    if source_setting and source_setting.get('useProxy', False):
-                        proxy_to_use = proxy_url
-                        self.logger.debug(f"Bangumi: 连接性检查将使用代理: {proxy_to_use}")
+            proxy_config = await self.config_manager.get_many(("proxyUrl", "proxyEnabled", "proxySslVerify"), "")
+            proxy_url = proxy_config["proxyUrl"]
+            proxy_enabled_globally = proxy_config["proxyEnabled"].lower() == 'true'
+            # 未配置时默认验证SSL证书
+            ssl_verify = proxy_config["proxySslVerify"].lower() != 'false'
+
+            if proxy_enabled_globally and proxy_url and self._settings.get('useProxy', False):
+                proxy_to_use = proxy_url
+                self.logger.debug(f"Bangumi: 连接性检查将使用代理: {proxy_to_use}")
             async with httpx.AsyncClient(timeout=10.0, proxy=proxy_to_use, verify=ssl_verify) as client:
                 response = await client.get("https://bgm.tv/")
                 return "连接成功 (未配置认证)" if response.status_code == 200 else f"连接失败 (状态码: {response.status_code})"
@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional, Set, Type
+import time
+from typing import Any, ClassVar, Dict, List, Optional, Set, Tuple, Type
 
+import httpx
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker # type: ignore
-from fastapi import Request
+from fastapi import APIRouter, Request
 from httpx import HTTPStatusError
 
 from .. import models
@@ -15,13 +18,36 @@ class BaseMetadataSource(ABC):
 
     # 每个子类必须定义自己的提供商名称
     provider_name: str
+    # 源可以提供自己的API路由，由管理器以 /{provider_name} 为前缀注册
+    api_router: ClassVar[Optional[APIRouter]] = None
+    # 这些配置项变更后，通过 `_get_client` 复用的客户端需要重建
+    client_config_keys: Tuple[str, ...] = ()
+    # 连接性检查结果的缓存时间（秒）
+    connectivity_cache_ttl: float = 30
+    # 这些配置项变更后，缓存的连接性检查结果需要失效
+    connectivity_config_keys: Tuple[str, ...] = ()
+    # 被替换的客户端延迟关闭的时间（秒），需长于请求超时，让仍在使用它的请求正常完成
+    retired_client_close_delay: float = 60
 
     def __init__(self, session_factory: async_sessionmaker[AsyncSession], config_manager: ConfigManager, scraper_manager: ScraperManager):
         self._session_factory = session_factory
         self.config_manager = config_manager
         self.scraper_manager = scraper_manager
+        # 该源在数据库中的持久设置（如 useProxy），由管理器在加载后注入。设置变更后管理器会重新加载所有源。
+        self._settings: Dict[str, Any] = {}
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.client: Optional[httpx.AsyncClient] = None
+        # 由 `_get_client` 惰性创建并在请求间复用的客户端
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_lock = asyncio.Lock()
+        self._client_stale = False
+        # 等待关闭被替换客户端的后台任务
+        self._retired_client_tasks: Set[asyncio.Task] = set()
+        # 最近一次连接性检查的 (检查时间, 状态)
+        self._connectivity_cache: Optional[Tuple[float, str]] = None
+        for key in self.client_config_keys:
+            self.config_manager.subscribe(key, self.invalidate_client)
+        for key in self.connectivity_config_keys:
+            self.config_manager.subscribe(key, self.invalidate_connectivity)
 
     @abstractmethod
     async def search(self, keyword: str, user: models.User, mediaType: Optional[str] = None) -> List[models.MetadataDetailsResponse]:
@@ -38,10 +64,28 @@ class BaseMetadataSource(ABC):
         """根据关键词搜索别名。"""
         raise NotImplementedError
 
-    @abstractmethod
     async def check_connectivity(self) -> str:
-        """检查与源的连接性，并返回状态字符串。"""
-        raise NotImplementedError
+        """
+        检查与源的连接性，并返回状态字符串。
+        结果会被缓存 `connectivity_cache_ttl` 秒，避免每次刷新管理页面都请求外部服务。
+        """
+        now = time.monotonic()
+        if self._connectivity_cache and now - self._connectivity_cache[0] < self.connectivity_cache_ttl:
+            return self._connectivity_cache[1]
+        result = await self._do_check_connectivity()
+        self._connectivity_cache = (now, result)
+        return result
+
+    async def _do_check_connectivity(self) -> str:
+        """
+        执行实际的连接性检查，并返回状态字符串。
+        子类应重写此方法；直接重写 `check_connectivity` 的旧式插件则不会经过这里。
+        """
+        raise NotImplementedError(f"源 '{self.provider_name}' 未实现连接性检查。")
+
+    def invalidate_connectivity(self):
+        """清除缓存的连接性检查结果。"""
+        self._connectivity_cache = None
     
     @abstractmethod
     async def execute_action(self, action_name: str, payload: Dict[str, Any], user: models.User, request: Request) -> Any:
@@ -58,7 +102,55 @@ class BaseMetadataSource(ABC):
         """
         return None # 默认实现不执行任何操作
 
+    async def _get_client(self) -> httpx.AsyncClient:
+        """
+        获取一个可复用的HTTP客户端。
+        首次调用或客户端失效后，会通过子类的 `_create_client` 重新创建。
+        """
+        if self._client is not None and not self._client_stale:
+            return self._client
+        async with self._client_lock:
+            # 再次检查，防止在等待锁的过程中其他协程已经创建了客户端
+            if self._client is None or self._client_stale:
+                old_client = self._client
+                self._client = await self._create_client()
+                self._client_stale = False
+                if old_client:
+                    self._retire_client(old_client)
+        return self._client
+
+    def _retire_client(self, client: httpx.AsyncClient):
+        """延迟关闭被替换的客户端，避免中断仍在使用它的请求。"""
+        task = asyncio.create_task(self._close_client_later(client))
+        self._retired_client_tasks.add(task)
+        task.add_done_callback(self._retired_client_tasks.discard)
+
+    async def _close_client_later(self, client: httpx.AsyncClient):
+        try:
+            await asyncio.sleep(self.retired_client_close_delay)
+        finally:
+            await client.aclose()
+
+    def _mark_client_stale(self):
+        """仅将复用的客户端标记为失效，下次请求时重建，不影响其他缓存。"""
+        self._client_stale = True
+
+    def invalidate_client(self):
+        """相关配置变更时调用：客户端需用最新配置重建，依赖旧配置的缓存也一并清除。"""
+        self._mark_client_stale()
+        self.invalidate_connectivity()
+
     async def close(self):
         """关闭所有打开的资源，例如HTTP客户端。"""
-        if self.client:
-            await self.client.aclose()
+        for key in self.client_config_keys:
+            self.config_manager.unsubscribe(key, self.invalidate_client)
+        for key in self.connectivity_config_keys:
+            self.config_manager.unsubscribe(key, self.invalidate_connectivity)
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+        # 取消等待中的延迟关闭任务，被替换的客户端会在任务的 finally 中立即关闭
+        retired_tasks = list(self._retired_client_tasks)
+        for task in retired_tasks:
+            task.cancel()
+        await asyncio.gather(*retired_tasks, return_exceptions=True)
@@ -8,7 +8,7 @@ from bs4 import BeautifulSoup
 from fastapi import HTTPException, status
 from pydantic import BaseModel, ValidationError
 
-from .. import crud, models
+from .. import models
 from .base import BaseMetadataSource, HTTPStatusError
 
 logger = logging.getLogger(__name__)
@@ -29,6 +29,7 @@ class DoubanJsonSearchResponse(BaseModel):
 # --- Main Metadata Source Class ---
 class DoubanMetadataSource(BaseMetadataSource): # type: ignore
     provider_name = "douban" # type: ignore
+    connectivity_config_keys = ("doubanCookie", "proxyUrl", "proxyEnabled")
 
     async def _create_client(self) -> httpx.AsyncClient:
         """Creates an httpx.AsyncClient with Douban cookie and proxy settings."""
@@ -40,14 +41,11 @@ class DoubanMetadataSource(BaseMetadataSource): # type: ignore
         if cookie:
             headers["Cookie"] = cookie
 
-        proxy_url = await self.config_manager.get("proxy_url", "")
-        proxy_enabled_globally = (await self.config_manager.get("proxy_enabled", "false")).lower() == 'true'
+        proxy_config = await self.config_manager.get_many(("proxyUrl", "proxyEnabled"), "")
+        proxy_url = proxy_config["proxyUrl"]
+        proxy_enabled_globally = proxy_config["proxyEnabled"].lower() == 'true'
 
-        async with self._session_factory() as session:
-            metadata_settings = await crud.get_all_metadata_source_settings(session)
-
-        provider_setting = next((s for s in metadata_settings if s['providerName'] == self.provider_name), None)
-        use_proxy_for_this_provider = provider_setting.get('use_proxy', False) if provider_setting else False
+        use_proxy_for_this_provider = self._settings.get('useProxy', False)
 
         proxy_to_use = proxy_url if proxy_enabled_globally and use_proxy_for_this_provider and proxy_url else None
 
@@ -151,7 +149,7 @@ class DoubanMetadataSource(BaseMetadataSource): # type: ignore
             self.logger.warning(f"豆瓣辅助搜索失败: {e}")
         return {alias for alias in local_aliases if alias}
 
-    async def check_connectivity(self) -> str:
+    async def _do_check_connectivity(self) -> str:
         try:
             async with await self._create_client() as client:
                 response = await client.get("https://movie.douban.com", timeout=10.0)
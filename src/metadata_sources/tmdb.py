@@ -23,6 +23,7 @@ def _clean_movie_title(title: Optional[str]) -> Optional[str]:
 
 class TmdbMetadataSource(BaseMetadataSource):
     provider_name = "tmdb"
+    connectivity_config_keys = ("tmdbApiKey", "tmdbApiBaseUrl")
 
     async def _get_robust_image_base_url(self) -> str:
         """
@@ -207,7 +208,7 @@ class TmdbMetadataSource(BaseMetadataSource):
             self.logger.warning(f"TMDB辅助搜索失败: {e}")
         return {alias for alias in aliases if alias}
 
-    async def check_connectivity(self) -> str:
+    async def _do_check_connectivity(self) -> str:
         try:
             async with await self._create_client() as client:
                 response = await client.get("/configuration")
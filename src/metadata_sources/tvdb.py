@@ -1,35 +1,115 @@
+import asyncio
+import json
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import httpx
 from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from .. import crud, models
+from .. import models
+from ..config_manager import ConfigManager
+from ..scraper_manager import ScraperManager
 from .base import BaseMetadataSource, HTTPStatusError
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson 为可选依赖，缺失时回退到标准库
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
 class TvdbMetadataSource(BaseMetadataSource):
     provider_name = "tvdb"
+    client_config_keys = ("tvdbApiKey", "proxyUrl", "proxyEnabled")
+    # 当前复用客户端所持有令牌的过期时间
+    _token_expires_at: Optional[datetime] = None
+    # search/get_details 响应在内存中的缓存时间（秒）和最大条目数
+    response_cache_ttl: float = 600
+    response_cache_maxsize: int = 512
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], config_manager: ConfigManager, scraper_manager: ScraperManager):
+        super().__init__(session_factory, config_manager, scraper_manager)
+        # (请求类型, 参数...) -> (过期时间, 响应)，按最近使用顺序排列
+        self._response_cache: "OrderedDict[Tuple[Any, ...], Tuple[float, Any]]" = OrderedDict()
+        # 缓存的 API Key，在 tvdbApiKey 等配置变更时清除
+        self._api_key: Optional[str] = None
+        # tvdbApiKey 变更后，数据库中缓存的令牌属于旧的 Key，需重新登录获取
+        self._ignore_stored_token = False
+        # 清除数据库中旧令牌的后台任务
+        self._token_cleanup_tasks: Set[asyncio.Task] = set()
+        self.config_manager.subscribe("tvdbApiKey", self._discard_stored_token)
+
+    def _get_cached_response(self, key: Tuple[Any, ...]) -> Any:
+        entry = self._response_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._response_cache[key]
+            return None
+        self._response_cache.move_to_end(key)
+        return entry[1]
+
+    def _set_cached_response(self, key: Tuple[Any, ...], value: Any):
+        self._response_cache[key] = (time.monotonic() + self.response_cache_ttl, value)
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > self.response_cache_maxsize:
+            self._response_cache.popitem(last=False)
+
+    def clear_response_cache(self):
+        """清空 search/get_details 的响应缓存。"""
+        self._response_cache.clear()
+
+    def invalidate_client(self):
+        # API Key 或代理变更后，之前缓存的响应也不再可信
+        super().invalidate_client()
+        self.clear_response_cache()
+        self._api_key = None
+
+    def _discard_stored_token(self):
+        """API Key 变更时调用，之后不再使用为旧 Key 签发的令牌。"""
+        self._ignore_stored_token = True
+        self._token_expires_at = None
+        # 回调是同步的，在后台清除数据库中的令牌，使其在重启后也不会被使用
+        task = asyncio.create_task(self._clear_stored_token())
+        self._token_cleanup_tasks.add(task)
+        task.add_done_callback(self._token_cleanup_tasks.discard)
+
+    async def _clear_stored_token(self):
+        try:
+            await self.config_manager.setValue("tvdbJwtToken", "")
+            await self.config_manager.setValue("tvdbTokenExpiresAt", "")
+        except Exception as e:
+            self.logger.error(f"清除TVDB缓存令牌失败: {e}", exc_info=True)
+
+    async def _get_api_key(self) -> str:
+        if self._api_key is None:
+            self._api_key = await self.config_manager.get("tvdbApiKey", "") or ""
+        return self._api_key
 
     async def _get_tvdb_token(self, client: httpx.AsyncClient) -> str:
         """获取一个有效的TVDB令牌，如果需要则从数据库或API刷新。"""
         # 1. 尝试从数据库配置中获取缓存的token和过期时间
-        token = await self.config_manager.get("tvdbJwtToken")
-        expires_at_str = await self.config_manager.get("tvdbTokenExpiresAt")
+        token_config = await self.config_manager.get_many(("tvdbJwtToken", "tvdbTokenExpiresAt"), "")
+        token = token_config["tvdbJwtToken"]
+        expires_at_str = token_config["tvdbTokenExpiresAt"]
 
-        if token and expires_at_str:
+        if token and expires_at_str and not self._ignore_stored_token:
             try:
                 expires_at = datetime.fromisoformat(expires_at_str)
                 if expires_at > datetime.utcnow():
                     self.logger.debug("TVDB: 使用数据库中缓存的有效token。")
+                    self._token_expires_at = expires_at
                     return token
             except ValueError:
                 self.logger.warning("TVDB: 数据库中的过期时间格式无效，将重新获取token。")
 
         self.logger.info("TVDB token 已过期或未找到，正在请求新的令牌。")
-        api_key = await self.config_manager.get("tvdbApiKey", "")
+        api_key = await self._get_api_key()
         if not api_key:
             raise ValueError("TVDB API Key 未配置。")
 
@@ -45,6 +125,8 @@ class TvdbMetadataSource(BaseMetadataSource):
             new_expires_at = datetime.utcnow() + timedelta(days=29)
             await self.config_manager.setValue("tvdbJwtToken", new_token)
             await self.config_manager.setValue("tvdbTokenExpiresAt", new_expires_at.isoformat())
+            self._token_expires_at = new_expires_at
+            self._ignore_stored_token = False
             
             self.logger.info("成功获取并缓存新的TVDB令牌。")
             return new_token
@@ -52,22 +134,33 @@ class TvdbMetadataSource(BaseMetadataSource):
             self.logger.error(f"获取TVDB令牌失败: {e}", exc_info=True)
             raise ValueError("TVDB认证失败。")
 
+    async def _get_proxy(self) -> Optional[str]:
+        """根据全局代理配置和该源的 useProxy 设置，返回应使用的代理地址。"""
+        proxy_config = await self.config_manager.get_many(("proxyUrl", "proxyEnabled"), "")
+        proxy_url = proxy_config["proxyUrl"]
+        proxy_enabled_globally = proxy_config["proxyEnabled"].lower() == 'true'
+
+        use_proxy_for_this_provider = self._settings.get('useProxy', False)
+        return proxy_url if proxy_enabled_globally and use_proxy_for_this_provider and proxy_url else None
+
     async def _create_client(self) -> httpx.AsyncClient:
         # 1. 获取代理配置
-        proxy_url = await self.config_manager.get("proxy_url", "")
-        proxy_enabled_globally = (await self.config_manager.get("proxy_enabled", "false")).lower() == 'true'
-
-        async with self._session_factory() as session:
-            metadata_settings = await crud.get_all_metadata_source_settings(session)
-        provider_setting = next((s for s in metadata_settings if s['providerName'] == self.provider_name), None)
-        use_proxy_for_this_provider = provider_setting.get('use_proxy', False) if provider_setting else False
-        proxy_to_use = proxy_url if proxy_enabled_globally and use_proxy_for_this_provider and proxy_url else None
+        proxy_to_use = await self._get_proxy()
 
         # 2. 创建一个基础客户端用于登录
-        base_client = httpx.AsyncClient(base_url="https://api4.thetvdb.com/v4", timeout=20.0, follow_redirects=True, proxy=proxy_to_use)
+        # 客户端会在请求间复用，启用HTTP/2以便并发请求复用同一个TLS连接
+        base_client = httpx.AsyncClient(
+            base_url="https://api4.thetvdb.com/v4", timeout=20.0, follow_redirects=True, proxy=proxy_to_use,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60),
+        )
 
-        # 3. 使用基础客户端获取认证Token
-        token = await self._get_tvdb_token(base_client)
+        # 3. 使用基础客户端获取认证Token，失败时关闭客户端以免泄漏连接
+        try:
+            token = await self._get_tvdb_token(base_client)
+        except Exception:
+            await base_client.aclose()
+            raise
 
         # 4. 将认证Token更新到客户端的请求头中
         base_client.headers.update({
@@ -76,26 +169,38 @@ class TvdbMetadataSource(BaseMetadataSource):
         })
         return base_client
 
+    async def _get_client(self) -> httpx.AsyncClient:
+        # 复用的客户端在请求头中携带了令牌，令牌过期后需要重建客户端以重新登录。
+        # 配置并未改变，因此保留响应缓存和 API Key。
+        if self._token_expires_at and self._token_expires_at <= datetime.utcnow():
+            self._mark_client_stale()
+        return await super()._get_client()
+
     async def search(self, keyword: str, user: models.User, mediaType: Optional[str] = None) -> List[models.MetadataDetailsResponse]:
+        cache_key = ("search", keyword, mediaType)
+        if (cached := self._get_cached_response(cache_key)) is not None:
+            return list(cached)
         try:
-            async with await self._create_client() as client:
-                params = {"query": keyword}
-                if mediaType:
-                    params["type"] = mediaType
-
-                response = await client.get("/search", params=params)
-                response.raise_for_status()
-                data = response.json().get("data", [])
-
-                results = []
-                for item in data:
-                    results.append(models.MetadataDetailsResponse(
-                        id=item['tvdb_id'], tvdbId=item['tvdb_id'],
-                        title=item.get('name'), imageUrl=item.get('image_url'),
-                        details=f"Year: {item.get('year')}",
-                        type="tv_series" if item.get("type") == "series" else item.get("type", "other")
-                    ))
-                return results
+            client = await self._get_client()
+            params = {"query": keyword}
+            if mediaType:
+                params["type"] = mediaType
+
+            response = await client.get("/search", params=params)
+            response.raise_for_status()
+            data = _json_loads(response.content).get("data", [])
+
+            results = []
+            for item in data:
+                results.append(models.MetadataDetailsResponse(
+                    id=item['tvdb_id'], tvdbId=item['tvdb_id'],
+                    title=item.get('name'), imageUrl=item.get('image_url'),
+                    details=f"Year: {item.get('year')}",
+                    type="tv_series" if item.get("type") == "series" else item.get("type", "other")
+                ))
+            if results:
+                self._set_cached_response(cache_key, list(results))
+            return results
         except ValueError as e:
             self.logger.error(f"TVDB搜索失败，配置错误: {e}")
             return []
@@ -107,46 +212,52 @@ class TvdbMetadataSource(BaseMetadataSource):
             return []
 
     async def get_details(self, item_id: str, user: models.User, mediaType: Optional[str] = None) -> Optional[models.MetadataDetailsResponse]:
+        cache_key = ("details", item_id, mediaType)
+        if (cached := self._get_cached_response(cache_key)) is not None:
+            return cached
         try:
-            async with await self._create_client() as client:
-                async def _fetch_and_parse(entity_type: str) -> Optional[models.MetadataDetailsResponse]:
-                    try:
-                        self.logger.info(f"TVDB: 正在尝试将ID {item_id} 作为 '{entity_type}' 获取...")
-                        response = await client.get(f"/{entity_type}/{item_id}/extended")
-                        if response.status_code == 404:
-                            self.logger.debug(f"TVDB: ID {item_id} 未被找到为 '{entity_type}'。")
-                            return None
-                        response.raise_for_status()
-                        details = response.json().get("data", {})
-                        if not details: return None
-                        imdb_id = None
-                        if remote_ids := details.get('remoteIds'):
-                            imdb_entry = next((rid for rid in remote_ids if rid.get('sourceName') == 'IMDB'), None)
-                            if imdb_entry: imdb_id = imdb_entry.get('id')
-                        return models.MetadataDetailsResponse(
-                            id=str(details['id']), tvdbId=str(details['id']), title=details.get('name'),
-                            imageUrl=details.get('image'), details=details.get('overview'), imdbId=imdb_id,
-                            type='movie' if entity_type == 'movies' else 'tv_series',
-                            year=int(details['year']) if details.get('year') and details['year'].isdigit() else None
-                        )
-                    except httpx.HTTPStatusError as e:
-                        self.logger.error(f"TVDB: 获取 {entity_type} (ID: {item_id}) 时发生HTTP错误: {e.response.status_code}")
-                        return None
-                    except Exception as e:
-                        self.logger.error(f"TVDB: 处理 {entity_type} (ID: {item_id}) 时发生未知错误: {e}", exc_info=True)
+            client = await self._get_client()
+            async def _fetch_and_parse(entity_type: str) -> Optional[models.MetadataDetailsResponse]:
+                try:
+                    self.logger.info(f"TVDB: 正在尝试将ID {item_id} 作为 '{entity_type}' 获取...")
+                    response = await client.get(f"/{entity_type}/{item_id}/extended")
+                    if response.status_code == 404:
+                        self.logger.debug(f"TVDB: ID {item_id} 未被找到为 '{entity_type}'。")
                         return None
+                    response.raise_for_status()
+                    details = _json_loads(response.content).get("data", {})
+                    if not details: return None
+                    imdb_id = None
+                    for rid in details.get('remoteIds') or ():
+                        if rid.get('sourceName') == 'IMDB':
+                            imdb_id = rid.get('id')
+                            break
+                    return models.MetadataDetailsResponse(
+                        id=str(details['id']), tvdbId=str(details['id']), title=details.get('name'),
+                        imageUrl=details.get('image'), details=details.get('overview'), imdbId=imdb_id,
+                        type='movie' if entity_type == 'movies' else 'tv_series',
+                        year=int(details['year']) if details.get('year') and details['year'].isdigit() else None
+                    )
+                except httpx.HTTPStatusError as e:
+                    self.logger.error(f"TVDB: 获取 {entity_type} (ID: {item_id}) 时发生HTTP错误: {e.response.status_code}")
+                    return None
+                except Exception as e:
+                    self.logger.error(f"TVDB: 处理 {entity_type} (ID: {item_id}) 时发生未知错误: {e}", exc_info=True)
+                    return None
 
-                details = None
-                if mediaType == "movie":
-                    details = await _fetch_and_parse("movies")
-                elif mediaType == "series":
+            details = None
+            if mediaType == "movie":
+                details = await _fetch_and_parse("movies")
+            elif mediaType == "series":
+                details = await _fetch_and_parse("series")
+            else:
+                details = await _fetch_and_parse("movies")
+                if not details:
+                    self.logger.info(f"TVDB: 作为电影获取失败，正在尝试作为电视剧获取...")
                     details = await _fetch_and_parse("series")
-                else:
-                    details = await _fetch_and_parse("movies")
-                    if not details:
-                        self.logger.info(f"TVDB: 作为电影获取失败，正在尝试作为电视剧获取...")
-                        details = await _fetch_and_parse("series")
-                return details
+            if details:
+                self._set_cached_response(cache_key, details)
+            return details
         except ValueError as e:
             self.logger.error(f"TVDB获取详情失败 (item_id={item_id}): {e}")
             raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(e))
@@ -157,19 +268,14 @@ class TvdbMetadataSource(BaseMetadataSource):
     async def search_aliases(self, keyword: str, user: models.User) -> Set[str]:
         return set()
 
-    async def check_connectivity(self) -> str:
+    async def _do_check_connectivity(self) -> str:
         try:
-            api_key = await self.config_manager.get("tvdbApiKey")
+            api_key = await self._get_api_key()
             if not api_key:
                 return "未配置API Key"
-            proxy_url = await self.config_manager.get("proxy_url", "")
-            proxy_enabled_globally = (await self.config_manager.get("proxy_enabled", "false")).lower() == 'true'
-            async with self._session_factory() as session:
-                metadata_settings = await crud.get_all_metadata_source_settings(session)
-            provider_setting = next((s for s in metadata_settings if s['providerName'] == self.provider_name), None)
-            use_proxy_for_this_provider = provider_setting.get('use_proxy', False) if provider_setting else False
-            proxy_to_use = proxy_url if proxy_enabled_globally and use_proxy_for_this_provider and proxy_url else None
-            async with httpx.AsyncClient(timeout=10.0, proxy=proxy_to_use) as client:
+            # 使用独立的未认证客户端直接探测登录端点，避免为了检查而先登录一次，
+            # 同时能如实报告登录失败时的状态码
+            async with httpx.AsyncClient(timeout=10.0, proxy=await self._get_proxy()) as client:
                 response = await client.post("https://api4.thetvdb.com/v4/login", json={"apikey": api_key})
                 if response.status_code == 200:
                     return "连接正常"
@@ -178,6 +284,11 @@ class TvdbMetadataSource(BaseMetadataSource):
         except Exception as e:
             self.logger.error(f"TVDB: 连接性检查失败: {e}", exc_info=True)
             return "连接失败"
+
+    async def close(self):
+        self.config_manager.unsubscribe("tvdbApiKey", self._discard_stored_token)
+        await super().close()
+
     async def execute_action(self, action_name: str, payload: Dict, user: models.User) -> Any:
         """TVDB source does not support custom actions."""
         raise NotImplementedError(f"源 '{self.provider_name}' 不支持任何自定义操作。")